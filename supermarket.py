@@ -6,7 +6,8 @@ Enhanced Version: Added 'Stock Analytics Graph'.
 Features:
 - Login: username 'python' / password 'python' (manager)
 - Billing page:
-    - Left: product list lines: "Name (Barcode: CODE) - ₹price - Stock: N" with [+] add button
+    - Left: product list lines: "Name (Barcode: CODE) - ₹price - Stock: N"; double-click
+      or the 'Add Selected Item' button adds to the bill
     - Barcode input to add by code
     - Right: billing tree (grouped), subtotal/tax/total, Clear/Remove/Edit, Customer, Generate PDF receipt
     - On checkout: backend stock decreases, stock_history recorded, low-stock detection & email alerts
@@ -23,38 +24,95 @@ Features:
 import os
 import sqlite3
 import json
+import time
+import hashlib
+import threading
+import concurrent.futures
+from collections import OrderedDict
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+from operator import itemgetter
 
 
-# Try to use reportlab for nicer PDF receipts
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.units import mm
-    from reportlab.pdfgen import canvas as pdfcanvas
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
-
-# Try to use matplotlib for graphs
-try:
-    import matplotlib
-    matplotlib.use("TkAgg")
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    import matplotlib.dates as mdates
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
+# reportlab (PDF receipts) and matplotlib (graphs) are heavy imports --
+# matplotlib alone can cost several hundred ms at startup -- so both are
+# deferred until first use. None means "not probed yet".
+REPORTLAB_AVAILABLE = None
+MATPLOTLIB_AVAILABLE = None
+
+def _import_reportlab():
+    global REPORTLAB_AVAILABLE, A4, mm, colors, getSampleStyleSheet
+    global SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    if REPORTLAB_AVAILABLE is None:
+        try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.units import mm
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            REPORTLAB_AVAILABLE = True
+        except Exception:
+            REPORTLAB_AVAILABLE = False
+    return REPORTLAB_AVAILABLE
+
+def _import_matplotlib():
+    global MATPLOTLIB_AVAILABLE, Figure, FigureCanvasTkAgg, mdates, np
+    if MATPLOTLIB_AVAILABLE is None:
+        try:
+            import matplotlib
+            matplotlib.use("TkAgg")
+            try:
+                # 'fast' trades a little rendering quality for simplified paths
+                import matplotlib.style as mplstyle
+                mplstyle.use('fast')
+            except ImportError:
+                pass
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            import matplotlib.dates as mdates
+            import numpy as np  # ships with matplotlib; used for vectorized ingest
+            MATPLOTLIB_AVAILABLE = True
+        except ImportError:
+            MATPLOTLIB_AVAILABLE = False
+    return MATPLOTLIB_AVAILABLE
+
+def _lttb_downsample(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: return indices of n_out representative
+    points chosen so the plotted shape is preserved. x and y are 1-D float
+    NumPy arrays of equal length.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # first and last points always survive; the middle is split into buckets
+    bins = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    idx = np.empty(n_out, dtype=np.intp)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bins[i], bins[i + 1]
+        nlo = bins[i + 1]
+        nhi = bins[i + 2] if i + 2 < n_out - 1 else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        # pick the bucket point forming the largest triangle with the previous
+        # kept point and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
 
 # ---------- Configuration ----------
 DB_FILE = "supermarket.db"
 LOW_STOCK_THRESHOLD = 10
 DEFAULT_TAX_PERCENT = 0.0  # kept zero as requested
+PDF_CACHE_MAX = 20  # receipts kept in memory for instant reprints
 # Email credentials (hardcoded per your request)
 EMAIL_USER = "sanjanahv6@gmail.com"
 EMAIL_PASS = "fcsn hais snwz pwiu"  # Replace with actual app password for real emailing
@@ -65,11 +123,53 @@ DEFAULT_PASSWORD = "python"
 DEFAULT_ROLE = "manager"
 
 # ---------- Database helpers ----------
+_WAL_ENABLED = False
+# UPDATE ... FROM needs SQLite 3.33+
+SQLITE_SUPPORTS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+# hot analytics query, kept as one constant so the statement cache always hits
+HIST_SQL = "SELECT record_ts, quantity FROM stock_history WHERE item_id=? ORDER BY record_ts"
+
 def get_conn():
-    conn = sqlite3.connect(DB_FILE)
+    """
+    Open a tuned connection (WAL, synchronous=NORMAL, in-memory temp store,
+    large page cache). Callers should hold on to the connection and reuse it
+    rather than connect per operation; SupermarketApp keeps one for its
+    lifetime.
+    """
+    global _WAL_ENABLED
+    # a roomy statement cache keeps hot parameterized queries compiled
+    conn = sqlite3.connect(DB_FILE, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    # WAL mode is persistent in the DB file, so only set it once per process
+    if not _WAL_ENABLED:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _WAL_ENABLED = True
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    # mmap turns warm B-tree page reads into plain memory loads
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
 
+def log_stock_changes(cursor, rows):
+    """
+    Bulk-append stock_history rows with a single prepared INSERT. rows is an
+    iterable of (item_id, record_date, record_ts, quantity) tuples; the caller
+    provides the surrounding transaction so one commit covers the whole batch.
+    """
+    cursor.executemany("INSERT INTO stock_history (item_id, record_date, record_ts, quantity) VALUES (?, ?, ?, ?)",
+                       rows)
+
+def tuple_cursor(conn):
+    """
+    Cursor returning plain tuples, bypassing the connection's sqlite3.Row
+    factory. Use for hot read paths where per-row Row wrapping matters.
+    """
+    c = conn.cursor()
+    c.row_factory = None
+    return c
+
 def init_db():
     conn = get_conn()
     c = conn.cursor()
@@ -104,6 +204,21 @@ def init_db():
                     record_date TEXT,
                     quantity INTEGER
                  )''')
+    # record_ts holds true Unix seconds (matching int(time.time()) writers):
+    # 8 bytes instead of a 19-char string, and reads need no parsing. Backfill
+    # databases created before the column; record_date strings are local wall
+    # time, so the 'utc' modifier converts them to real epochs.
+    cols = [r['name'] for r in c.execute("PRAGMA table_info(stock_history)")]
+    if 'record_ts' not in cols:
+        c.execute("ALTER TABLE stock_history ADD COLUMN record_ts INTEGER")
+        c.execute("UPDATE stock_history SET record_ts = strftime('%s', record_date, 'utc')")
+    # Indexes for the hot lookups (analytics history by item, sales by date).
+    # The history index includes quantity so the analytics query is answered
+    # entirely from the index (ordered range scan, no table lookups, no sort).
+    c.execute("DROP INDEX IF EXISTS idx_stock_history_item")
+    c.execute("DROP INDEX IF EXISTS idx_stock_history_item_date")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stock_history_item_ts ON stock_history(item_id, record_ts, quantity)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date)")
     # add single default user if none
     c.execute("SELECT COUNT(*) AS cnt FROM users")
     if c.fetchone()["cnt"] == 0:
@@ -135,99 +250,79 @@ def seed_default_items(cursor):
         ("SOAP001", "Soap (Lux)", "Personal Care", 35.00, 20),
         ("BAGPLST", "Plastic Carry Bag", "General", 5.00, 100)
     ]
-    for barcode, name, cat, price, qty in defaults:
-        cursor.execute('''INSERT OR IGNORE INTO inventory (barcode, name, category, price, quantity, created_at)
-                          VALUES (?, ?, ?, ?, ?, ?)''', (barcode, name, cat, price, qty, now))
-        # Initial history record
-        cursor.execute("SELECT id FROM inventory WHERE barcode=?", (barcode,))
-        row = cursor.fetchone()
-        if row:
-            cursor.execute("INSERT INTO stock_history (item_id, record_date, quantity) VALUES (?, ?, ?)",
-                           (row['id'], now, qty))
+    cursor.executemany('''INSERT OR IGNORE INTO inventory (barcode, name, category, price, quantity, created_at)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       [(barcode, name, cat, price, qty, now) for barcode, name, cat, price, qty in defaults])
+    # Initial history records, batched
+    placeholders = ",".join("?" * len(defaults))
+    cursor.execute(f"SELECT id, quantity FROM inventory WHERE barcode IN ({placeholders})",
+                   [d[0] for d in defaults])
+    now_ts = int(time.time())
+    log_stock_changes(cursor, [(row['id'], now, now_ts, row['quantity']) for row in cursor.fetchall()])
 
 # ---------- Email alert ----------
-def send_low_stock_email(item_name, barcode, qty_remaining):
+def build_low_stock_msg(item_name, barcode, qty_remaining):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_USER
+    msg['To'] = EMAIL_USER
+    msg['Subject'] = f"[ALERT] Low Stock: {item_name} ({barcode})"
+    body = f"Attention,\n\nItem '{item_name}' (Barcode: {barcode}) has low stock.\nRemaining quantity: {qty_remaining}\n\nPlease restock soon.\n\n-- Supermarket System"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def send_low_stock_emails(items):
     """
-    Send a simple low-stock email to EMAIL_USER. Returns (success, message).
+    Send low-stock emails for a list of (name, barcode, qty_remaining) tuples
+    over a single SMTP session. Returns (success, message).
     """
     try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = EMAIL_USER
-        msg['Subject'] = f"[ALERT] Low Stock: {item_name} ({barcode})"
-        body = f"Attention,\n\nItem '{item_name}' (Barcode: {barcode}) has low stock.\nRemaining quantity: {qty_remaining}\n\nPlease restock soon.\n\n-- Supermarket System"
-        msg.attach(MIMEText(body, 'plain'))
-
         server = smtplib.SMTP('smtp.gmail.com', 587, timeout=10)
         server.starttls()
         server.login(EMAIL_USER, EMAIL_PASS)
-        server.send_message(msg)
+        for item_name, barcode, qty_remaining in items:
+            server.send_message(build_low_stock_msg(item_name, barcode, qty_remaining))
         server.quit()
-        return True, "Email sent"
+        return True, f"Sent {len(items)} email(s)"
     except Exception as e:
         return False, str(e)
 
 # ---------- PDF receipt ----------
-def generate_neat_pdf(filepath, shop_name, cashier, customer_name, items, subtotal, tax, total):
-    if REPORTLAB_AVAILABLE:
+def generate_neat_pdf(filepath, shop_name, cashier, customer_name, items, subtotal, tax, total, sale_date):
+    if _import_reportlab():
         try:
-            c = pdfcanvas.Canvas(filepath, pagesize=A4)
-            width, height = A4
-            margin = 20 * mm
-            y = height - margin
-
-            # header
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(margin, y, shop_name)
-            y -= 8 * mm
-            c.setFont("Helvetica", 9)
-            c.drawString(margin, y, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            c.drawRightString(width - margin, y, f"Cashier: {cashier}")
-            y -= 8 * mm
-            c.line(margin, y, width - margin, y)
-            y -= 6 * mm
-
-            # table header
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(margin, y, "Item")
-            c.drawRightString(width - margin - 120, y, "Qty")
-            c.drawRightString(width - margin - 60, y, "Price")
-            c.drawRightString(width - margin, y, "Total")
-            y -= 6 * mm
-            c.setFont("Helvetica", 9)
-            c.line(margin, y, width - margin, y)
-            y -= 6 * mm
-
-            # items
-            for it in items:
-                name = it['name'][:30]
-                qty = it['quantity']
-                price = it['price']
-                line_total = price * qty
-                c.drawString(margin, y, name)
-                c.drawRightString(width - margin - 120, y, str(qty))
-                c.drawRightString(width - margin - 60, y, f"₹{price:.2f}")
-                c.drawRightString(width - margin, y, f"₹{line_total:.2f}")
-                y -= 6 * mm
-                if y < margin + 40:
-                    c.showPage()
-                    y = height - margin
-
-            y -= 6 * mm
-            c.line(margin, y, width - margin, y)
-            y -= 6 * mm
-
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(margin, y, f"Subtotal: ₹{subtotal:.2f}")
-            y -= 6 * mm
-            c.drawString(margin, y, f"Tax: ₹{tax:.2f}")
-            y -= 6 * mm
-            c.drawString(margin, y, f"TOTAL: ₹{total:.2f}")
-            y -= 10 * mm
-
-            c.setFont("Helvetica", 9)
-            c.drawString(margin, y, "Thank you for shopping with us!")
-            c.save()
+            doc = SimpleDocTemplate(filepath, pagesize=A4,
+                                    leftMargin=20 * mm, rightMargin=20 * mm,
+                                    topMargin=20 * mm, bottomMargin=20 * mm)
+            styles = getSampleStyleSheet()
+
+            # item table: one flowable, Platypus handles page breaks itself
+            data = [["Item", "Qty", "Price", "Total"]]
+            getter = itemgetter('name', 'quantity', 'price')
+            for name, qty, price in map(getter, items):
+                data.append([name[:30], str(qty), f"₹{price:.2f}", f"₹{price * qty:.2f}"])
+            table = Table(data, colWidths=[85 * mm, 20 * mm, 30 * mm, 30 * mm], repeatRows=1)
+            table.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+                ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+                ('LINEABOVE', (0, -1), (-1, -1), 0.25, colors.grey),
+            ]))
+
+            story = [
+                Paragraph(shop_name, styles['Title']),
+                Paragraph(f"Date: {sale_date} | "
+                          f"Cashier: {cashier} | Customer: {customer_name}", styles['Normal']),
+                Spacer(1, 6 * mm),
+                table,
+                Spacer(1, 6 * mm),
+                Paragraph(f"Subtotal: ₹{subtotal:.2f}", styles['Normal']),
+                Paragraph(f"Tax: ₹{tax:.2f}", styles['Normal']),
+                Paragraph(f"<b>TOTAL: ₹{total:.2f}</b>", styles['Normal']),
+                Spacer(1, 8 * mm),
+                Paragraph("Thank you for shopping with us!", styles['Normal']),
+            ]
+            doc.build(story)
             return True, "PDF generated"
         except Exception as e:
             return False, str(e)
@@ -236,7 +331,7 @@ def generate_neat_pdf(filepath, shop_name, cashier, customer_name, items, subtot
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write("=== Supermarket Receipt ===\n")
-                f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"Date: {sale_date}\n")
                 f.write(f"Cashier: {cashier}    Customer: {customer_name}\n")
                 f.write("="*40 + "\n")
                 for it in items:
@@ -259,8 +354,25 @@ class SupermarketApp:
         self.current_user = None
         self.current_role = None
         self.current_bill = []  # list of dicts: barcode, name, price, quantity
+        self.current_bill_map = {}  # barcode -> bill entry, for O(1) increment
+        self._search_after_id = None  # pending debounce timer for the search box
+        # SMTP is slow (1-5s per message); keep it off the Tk main thread
+        self.mail_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._pdf_cache = OrderedDict()  # bill content-hash -> receipt bytes (LRU)
+        self._hist_cache = {}  # item_id -> (dates array, quants array) for analytics
+        self._hist_dirty = set()  # item_ids whose history changed since last plot
+        self._last_plotted_item_id = None
+        # history loads run off the Tk thread (WAL lets this reader run
+        # alongside checkout writes); the single worker keeps its own connection
+        self.db_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._db_local = threading.local()
         self.item_map = {} # Maps item name to ID for graph
         init_db()
+        # one long-lived connection reused by all UI handlers (Tk is single-threaded)
+        self.conn = get_conn()
+        # users rarely change; cache them so login is a dict lookup
+        self.users = {row['username']: (row['password'], row['role'])
+                      for row in self.conn.execute("SELECT username, password, role FROM users")}
         self.create_login_screen()
 
     # ---- Login Screen ----
@@ -291,14 +403,10 @@ class SupermarketApp:
         if not username or not password:
             messagebox.showerror("Error", "Enter username and password")
             return
-        conn = get_conn()
-        c = conn.cursor()
-        c.execute("SELECT role FROM users WHERE username=? AND password=?", (username, password))
-        row = c.fetchone()
-        conn.close()
-        if row:
+        pwd, role = self.users.get(username, (None, None))
+        if pwd is not None and pwd == password:
             self.current_user = username
-            self.current_role = row["role"]
+            self.current_role = role
             self.show_main_ui()
         else:
             messagebox.showerror("Login Failed", "Invalid username or password")
@@ -336,18 +444,27 @@ class SupermarketApp:
             self.current_user = None
             self.current_role = None
             self.current_bill = []
+            self.current_bill_map = {}
             self.create_login_screen()
 
     # ---- Inventory cache ----
     def load_inventory_cache(self):
-        conn = get_conn()
-        c = conn.cursor()
+        c = self.conn.cursor()
         c.execute("SELECT * FROM inventory ORDER BY name")
-        self.inventory = [dict(r) for r in c.fetchall()]
-        conn.close()
+        # keep the sqlite3.Row objects as-is; dict() per row was the main refresh cost
+        self.inventory = c.fetchall()
+        # precomputed lowercase haystacks, parallel to self.inventory (Rows are immutable)
+        self.inventory_search = [f"{it['name']} {it['barcode']} {it['category']}".lower()
+                                 for it in self.inventory]
         
         # Build map for analytics
         self.item_map = {item['name']: item['id'] for item in self.inventory}
+        # O(1) barcode lookup for the billing page
+        self.inventory_by_barcode = {it['barcode'].strip().lower(): it for it in self.inventory}
+        # barcode -> position in self.inventory, for in-place row replacement
+        self._inv_pos = {it['barcode']: i for i, it in enumerate(self.inventory)}
+        # the SELECT already orders by name, so the combobox list needs no sort
+        self._sorted_names = tuple(it['name'] for it in self.inventory)
 
         # refresh UI components
         self.populate_product_list()
@@ -355,6 +472,31 @@ class SupermarketApp:
         self.populate_low_stock_warning()
         self.populate_combobox()
 
+    def refresh_items_after_sale(self, barcodes):
+        # re-fetch just the changed rows and patch caches + tree rows in place,
+        # instead of rebuilding every widget via load_inventory_cache()
+        c = self.conn.cursor()
+        placeholders = ",".join("?" * len(barcodes))
+        c.execute(f"SELECT * FROM inventory WHERE barcode IN ({placeholders})", barcodes)
+        for row in c.fetchall():
+            bc = row['barcode']
+            self._hist_dirty.add(row['id'])
+            pos = self._inv_pos.get(bc)
+            if pos is not None:
+                self.inventory[pos] = row
+            self.inventory_by_barcode[bc.strip().lower()] = row
+            low = row['quantity'] < LOW_STOCK_THRESHOLD
+            tags = ('low',) if low else ()
+            stock_iid = self.stock_iid_by_barcode.get(bc)
+            if stock_iid:
+                self.stock_tree.set(stock_iid, "Stock", row['quantity'])
+                self.stock_tree.item(stock_iid, tags=tags)
+            prod_iid = self.prod_iid_by_barcode.get(bc)
+            if prod_iid:
+                line_text = f"{row['name']} (Barcode: {bc}) - ₹{row['price']:.2f} - Stock: {row['quantity']}"
+                self.prod_tree.item(prod_iid, text=line_text, tags=tags)
+        self.populate_low_stock_warning()
+
     # ---- Billing Page ----
     def build_billing_page(self, parent):
         # Left panel: products
@@ -371,7 +513,7 @@ class SupermarketApp:
         self.search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
         search_entry.pack(side='left', padx=4)
-        search_entry.bind("<KeyRelease>", lambda e: self.populate_product_list())
+        search_entry.bind("<KeyRelease>", lambda e: self.schedule_product_list_refresh())
 
         barcode_frame = ttk.Frame(left)
         barcode_frame.pack(fill='x', padx=8, pady=(4,8))
@@ -383,17 +525,20 @@ class SupermarketApp:
         add_barcode_btn.pack(side='left', padx=6)
         barcode_entry.bind('<Return>', lambda e: self.add_by_barcode_button())
 
-        # Scrollable product list area (single-line entries)
+        # Scrollable product list (Treeview rows are much cheaper than per-item widgets)
         product_area = ttk.Frame(left)
         product_area.pack(fill='both', expand=True, padx=8, pady=6)
-        canvas = tk.Canvas(product_area)
-        self.prod_scrollbar = ttk.Scrollbar(product_area, orient="vertical", command=canvas.yview)
-        self.product_list_inner = ttk.Frame(canvas)
-        self.product_list_inner.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=self.product_list_inner, anchor='nw')
-        canvas.configure(yscrollcommand=self.prod_scrollbar.set)
-        canvas.pack(side='left', fill='both', expand=True)
+        self.prod_tree = ttk.Treeview(product_area, show='tree', selectmode='browse')
+        self.prod_tree.column("#0", width=520)
+        self.prod_tree.tag_configure('low', foreground='red')
+        self.prod_scrollbar = ttk.Scrollbar(product_area, orient="vertical", command=self.prod_tree.yview)
+        self.prod_tree.configure(yscrollcommand=self.prod_scrollbar.set)
+        self.prod_tree.pack(side='left', fill='both', expand=True)
         self.prod_scrollbar.pack(side='right', fill='y')
+        self.prod_tree.bind("<Double-1>", lambda e: self.add_selected_product())
+        self.prod_iid_to_barcode = {}
+        self.prod_iid_by_barcode = {}
+        ttk.Button(left, text="Add Selected Item", command=self.add_selected_product).pack(anchor='w', padx=8, pady=(0,8))
 
         # Right side: current bill
         ttk.Label(right, text="🧾 Current Bill", font=("Arial", 14, "bold")).pack(pady=(8,6))
@@ -425,30 +570,42 @@ class SupermarketApp:
         ttk.Button(right, text="Generate Bill (PDF)", command=self.process_checkout).pack(fill='x', padx=12, pady=(6,6))
         ttk.Button(right, text="Refresh Inventory", command=self.load_inventory_cache).pack(fill='x', padx=12, pady=(2,6))
 
+    def schedule_product_list_refresh(self):
+        # debounce: rebuild once ~150ms after the user stops typing
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(150, self.populate_product_list)
+
     def populate_product_list(self):
-        # clear existing
-        for w in self.product_list_inner.winfo_children():
-            w.destroy()
+        self._search_after_id = None
+        # clear existing rows (and both iid maps, so no stale iids survive)
+        self.prod_tree.delete(*self.prod_tree.get_children())
+        self.prod_iid_to_barcode = {}
+        self.prod_iid_by_barcode = {}
         q = self.search_var.get().strip().lower()
-        items = [it for it in self.inventory if (q in it['name'].lower() or q in it['barcode'].lower() or q in it['category'].lower())] if q else self.inventory
+        items = [it for it, s in zip(self.inventory, self.inventory_search) if q in s] if q else self.inventory
         if not items:
-            lbl = ttk.Label(self.product_list_inner, text="No items found.", foreground="gray")
-            lbl.pack(padx=8, pady=8)
+            self.prod_tree.insert("", "end", text="No items found.")
             return
         for it in items:
             line_text = f"{it['name']} (Barcode: {it['barcode']}) - ₹{it['price']:.2f} - Stock: {it['quantity']}"
-            row = ttk.Frame(self.product_list_inner)
-            row.pack(fill='x', padx=6, pady=4)
-            lbl = ttk.Label(row, text=line_text)
-            lbl.pack(side='left', padx=6)
-            if it['quantity'] < LOW_STOCK_THRESHOLD:
-                lbl.configure(foreground='red')
-            add_btn = ttk.Button(row, text="+", width=3, command=lambda b=it['barcode']: self.add_item_by_barcode(b))
-            add_btn.pack(side='right', padx=6)
+            tags = ('low',) if it['quantity'] < LOW_STOCK_THRESHOLD else ()
+            iid = self.prod_tree.insert("", "end", text=line_text, tags=tags)
+            self.prod_iid_to_barcode[iid] = it['barcode']
+            self.prod_iid_by_barcode[it['barcode']] = iid
+
+    def add_selected_product(self):
+        sel = self.prod_tree.selection()
+        if not sel:
+            messagebox.showinfo("Select", "Select a product in the list to add.")
+            return
+        barcode = self.prod_iid_to_barcode.get(sel[0])
+        if barcode:
+            self.add_item_by_barcode(barcode)
 
     def add_item_by_barcode(self, barcode):
         # find item
-        item = next((i for i in self.inventory if i['barcode'].strip().lower() == barcode.strip().lower()), None)
+        item = self.inventory_by_barcode.get(barcode.strip().lower())
         if item is None:
             messagebox.showerror("Not found", f"No item with barcode: {barcode}")
             return
@@ -456,18 +613,19 @@ class SupermarketApp:
             messagebox.showerror("Out of stock", f"{item['name']} is out of stock.")
             return
         # add or increment in current_bill
-        for b in self.current_bill:
-            if b['barcode'] == item['barcode']:
-                b['quantity'] += 1
-                break
+        entry = self.current_bill_map.get(item['barcode'])
+        if entry:
+            entry['quantity'] += 1
         else:
-            self.current_bill.append({'barcode': item['barcode'], 'name': item['name'], 'price': item['price'], 'quantity': 1})
+            entry = {'barcode': item['barcode'], 'name': item['name'], 'price': item['price'], 'quantity': 1}
+            self.current_bill.append(entry)
+            self.current_bill_map[item['barcode']] = entry
         self.update_bill_display()
 
     def add_by_barcode_button(self):
         code = self.barcode_var.get().strip()
         if not code:
-            messagebox.showinfo("Enter barcode", "Please enter a barcode or press + next to an item.")
+            messagebox.showinfo("Enter barcode", "Please enter a barcode, or double-click an item in the list (or use 'Add Selected Item').")
             return
         self.add_item_by_barcode(code)
         self.barcode_var.set("")
@@ -491,6 +649,7 @@ class SupermarketApp:
             return
         if messagebox.askyesno("Confirm", "Clear current bill?"):
             self.current_bill = []
+            self.current_bill_map = {}
             self.update_bill_display()
 
     def remove_selected_bill_item(self):
@@ -501,6 +660,7 @@ class SupermarketApp:
         idx = self.bill_tree.index(sel[0])
         if 0 <= idx < len(self.current_bill):
             removed = self.current_bill.pop(idx)
+            self.current_bill_map.pop(removed['barcode'], None)
             self.update_bill_display()
             messagebox.showinfo("Removed", f"Removed {removed['name']}")
 
@@ -526,11 +686,9 @@ class SupermarketApp:
                 messagebox.showerror("Invalid", "Enter a valid integer quantity (>=1).")
                 return
             # check stock available in DB
-            conn = get_conn()
-            c = conn.cursor()
+            c = self.conn.cursor()
             c.execute("SELECT quantity FROM inventory WHERE barcode=?", (item['barcode'],))
             row = c.fetchone()
-            conn.close()
             avail = row['quantity'] if row else 0
             if nq > avail:
                 messagebox.showerror("Not enough stock", f"Only {avail} available in inventory.")
@@ -545,27 +703,35 @@ class SupermarketApp:
         if not self.current_bill:
             messagebox.showinfo("Empty", "No items in the bill.")
             return
-        # verify stock availability
-        conn = get_conn()
+        # verify stock availability with a single IN-query
+        conn = self.conn
         c = conn.cursor()
+        placeholders = ",".join("?" * len(self.current_bill))
+        c.execute(f"SELECT barcode, quantity FROM inventory WHERE barcode IN ({placeholders})",
+                  [b['barcode'] for b in self.current_bill])
+        stock_now = {r['barcode']: r['quantity'] for r in c.fetchall()}
         for b in self.current_bill:
-            c.execute("SELECT quantity FROM inventory WHERE barcode=?", (b['barcode'],))
-            row = c.fetchone()
-            if not row or row['quantity'] < b['quantity']:
-                conn.close()
+            if stock_now.get(b['barcode'], 0) < b['quantity']:
                 messagebox.showerror("Stock error", f"Not enough stock for {b['name']}")
                 return
-        # deduct from inventory and record history
-        for b in self.current_bill:
-            c.execute("UPDATE inventory SET quantity = quantity - ? WHERE barcode=?", (b['quantity'], b['barcode']))
-            # record stock_history: current remaining
-            c.execute("SELECT id, quantity FROM inventory WHERE barcode=?", (b['barcode'],))
-            rr = c.fetchone()
-            if rr:
-                item_id = rr['id']
-                remaining = rr['quantity']
-                c.execute("INSERT INTO stock_history (item_id, record_date, quantity) VALUES (?, ?, ?)",
-                          (item_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), remaining))
+        # deduct from inventory and record history (batched in one transaction)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("BEGIN")
+        if SQLITE_SUPPORTS_UPDATE_FROM:
+            # one logical write for the whole bill (VALUES columns are column1/column2)
+            values_sql = ",".join("(?,?)" for _ in self.current_bill)
+            params = [x for b in self.current_bill for x in (b['barcode'], b['quantity'])]
+            c.execute(f"UPDATE inventory SET quantity = quantity - v.column2 "
+                      f"FROM (VALUES {values_sql}) AS v WHERE inventory.barcode = v.column1",
+                      params)
+        else:
+            c.executemany("UPDATE inventory SET quantity = quantity - ? WHERE barcode=?",
+                          [(b['quantity'], b['barcode']) for b in self.current_bill])
+        # one SELECT for the remaining stocks, then one bulk insert into stock_history
+        c.execute(f"SELECT id, quantity FROM inventory WHERE barcode IN ({placeholders})",
+                  [b['barcode'] for b in self.current_bill])
+        now_ts = int(time.time())
+        log_stock_changes(c, [(r['id'], now, now_ts, r['quantity']) for r in c.fetchall()])
         # save the sale
         subtotal = sum(it['price'] * it['quantity'] for it in self.current_bill)
         tax = subtotal * DEFAULT_TAX_PERCENT
@@ -574,28 +740,22 @@ class SupermarketApp:
         c.execute("INSERT INTO sales (sale_date, items_json, total_amount, customer_name) VALUES (?, ?, ?, ?)",
                   (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), json.dumps(self.current_bill), total, customer))
         conn.commit()
-        conn.close()
 
-        # refresh cache to reflect updated stock
-        self.load_inventory_cache()
+        # detect low-stock items with a single IN-query on the open connection
+        c.execute(f"SELECT name, barcode, quantity FROM inventory WHERE barcode IN ({placeholders})",
+                  [b['barcode'] for b in self.current_bill])
+        low_items = [(r['name'], r['barcode'], r['quantity']) for r in c.fetchall()
+                     if r['quantity'] < LOW_STOCK_THRESHOLD]
 
-        # detect low-stock items and send emails
-        low_items = []
-        for b in self.current_bill:
-            conn = get_conn()
-            c = conn.cursor()
-            c.execute("SELECT name, barcode, quantity FROM inventory WHERE barcode=?", (b['barcode'],))
-            row = c.fetchone()
-            conn.close()
-            if row and row['quantity'] < LOW_STOCK_THRESHOLD:
-                low_items.append((row['name'], row['barcode'], row['quantity']))
+        # refresh only the rows whose stock changed
+        self.refresh_items_after_sale([b['barcode'] for b in self.current_bill])
 
         # save receipt (PDF or TXT)
         filename = filedialog.asksaveasfilename(defaultextension=".pdf",
                                                 filetypes=[("PDF Files", "*.pdf"), ("Text Files", "*.txt"), ("All Files", "*.*")],
                                                 initialfile=f"receipt_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
         if filename:
-            ok, msg = generate_neat_pdf(filename, "Supermarket System", self.current_user, customer, self.current_bill, subtotal, tax, total)
+            ok, msg = self.save_receipt(filename, customer, subtotal, tax, total, now)
             if ok:
                 messagebox.showinfo("Receipt", f"Receipt saved: {filename}")
             else:
@@ -604,22 +764,54 @@ class SupermarketApp:
         # show low-stock warnings and send emails
         if low_items:
             lines = [f"{n} (Barcode: {b}) - Remaining: {q}" for n,b,q in low_items]
-            # try sending email for each low item
-            for n,b,q in low_items:
-                success, resp = send_low_stock_email(n, b, q)
-                if not success:
-                    # print to console for debugging but don't block the app
-                    print("Email send failed:", resp)
+            # dispatch one batched send to the worker pool so checkout returns immediately
+            future = self.mail_pool.submit(send_low_stock_emails, low_items)
+            future.add_done_callback(self._report_email_result)
             messagebox.showwarning("Low Stock Alert", "Low-stock items detected:\n\n" + "\n".join(lines))
 
         # clear current bill
         self.current_bill = []
+        self.current_bill_map = {}
         self.update_bill_display()
         try:
             self.customer_entry.delete(0, 'end')
         except Exception:
             pass
 
+    def save_receipt(self, filepath, customer, subtotal, tax, total, sale_date):
+        # memoize receipt bytes so re-saving the same sale is a plain file
+        # write; the sale date is part of the key (and the rendered receipt),
+        # so a cache hit is always a true reprint of that sale
+        key = hashlib.sha1(json.dumps(
+            [self.current_bill, subtotal, total, customer, self.current_user, sale_date],
+            sort_keys=True).encode()).hexdigest()
+        cached = self._pdf_cache.get(key)
+        if cached is not None:
+            self._pdf_cache.move_to_end(key)
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(cached)
+                return True, "Receipt reprinted from cache"
+            except Exception as e:
+                return False, str(e)
+        ok, msg = generate_neat_pdf(filepath, "Supermarket System", self.current_user, customer,
+                                    self.current_bill, subtotal, tax, total, sale_date)
+        if ok:
+            try:
+                with open(filepath, 'rb') as f:
+                    self._pdf_cache[key] = f.read()
+                while len(self._pdf_cache) > PDF_CACHE_MAX:
+                    self._pdf_cache.popitem(last=False)
+            except OSError:
+                pass
+        return ok, msg
+
+    def _report_email_result(self, future):
+        # runs on the worker thread; print failures for debugging, never block the app
+        success, resp = future.result()
+        if not success:
+            print("Email send failed:", resp)
+
     # ---- Stock Dashboard ----
     def build_stock_page(self, parent):
         top = ttk.Frame(parent)
@@ -646,6 +838,7 @@ class SupermarketApp:
                 self.stock_tree.column(c, width=260)
             else:
                 self.stock_tree.column(c, width=100, anchor='center')
+        self.stock_tree.tag_configure('low', foreground='red')
         vsb = ttk.Scrollbar(table_frame, orient='vertical', command=self.stock_tree.yview)
         self.stock_tree.configure(yscrollcommand=vsb.set)
         self.stock_tree.pack(side='left', fill='both', expand=True)
@@ -655,15 +848,13 @@ class SupermarketApp:
         # clear
         for r in self.stock_tree.get_children():
             self.stock_tree.delete(r)
-        # fill
+        # fill, tagging low-stock rows at insert time
+        self.stock_iid_by_barcode = {}
         for it in self.inventory:
             vals = (it['id'], it['name'], it['category'], f"₹{it['price']:.2f}", it['quantity'], it['barcode'])
-            iid = self.stock_tree.insert("", "end", values=vals)
-            if it['quantity'] < LOW_STOCK_THRESHOLD:
-                # tag the item as low stock
-                self.stock_tree.tag_configure('low', foreground='red')
-                current_tags = self.stock_tree.item(iid, 'tags') or ()
-                self.stock_tree.item(iid, tags=current_tags + ('low',))
+            tags = ('low',) if it['quantity'] < LOW_STOCK_THRESHOLD else ()
+            iid = self.stock_tree.insert("", "end", values=vals, tags=tags)
+            self.stock_iid_by_barcode[it['barcode']] = iid
 
     def populate_low_stock_warning(self):
         low = [it for it in self.inventory if it['quantity'] < LOW_STOCK_THRESHOLD]
@@ -677,6 +868,8 @@ class SupermarketApp:
 
     # ---- Analytics Page (Graph) ----
     def build_analytics_page(self, parent):
+        # the replot guard is scoped to this figure: a rebuilt tab starts blank
+        self._last_plotted_item_id = None
         top_frame = ttk.Frame(parent)
         top_frame.pack(fill='x', padx=10, pady=10)
 
@@ -690,18 +883,39 @@ class SupermarketApp:
         self.graph_container = ttk.Frame(parent, relief="sunken", borderwidth=1)
         self.graph_container.pack(fill='both', expand=True, padx=10, pady=10)
 
-        if not MATPLOTLIB_AVAILABLE:
+        if not _import_matplotlib():
             ttk.Label(self.graph_container, text="Matplotlib not installed. Graphs unavailable.", foreground="red").pack(pady=50)
+            return
+
+        # one persistent Figure/canvas; reloads only swap the line data instead of
+        # tearing down and rebuilding every artist and the Tk canvas
+        self.hist_fig = Figure(figsize=(8, 5), dpi=100)
+        self.hist_ax = self.hist_fig.add_subplot(111)
+        (self.hist_line,) = self.hist_ax.plot([], [], linestyle='-', color='blue')
+        self.hist_line.set_antialiased(False)
+        # markers live in one PathCollection instead of a Path per point, and
+        # are only shown for short histories where they are readable anyway
+        self.hist_scatter = self.hist_ax.scatter([], [], s=10, color='blue')
+        self.hist_ax.set_xlabel("Time")
+        self.hist_ax.set_ylabel("Quantity")
+        self.hist_ax.grid(True, linewidth=0.5, antialiased=False)
+        self.hist_ax.xaxis_date()
+        self.hist_ax.xaxis.set_major_locator(mdates.AutoDateLocator(maxticks=8))
+        self.hist_ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+        # fixed rotation and bottom margin replace the per-plot autofmt_xdate pass
+        self.hist_ax.tick_params(axis='x', rotation=30)
+        self.hist_fig.subplots_adjust(bottom=0.18)
+        self.hist_canvas = FigureCanvasTkAgg(self.hist_fig, master=self.graph_container)
+        self.hist_canvas.get_tk_widget().pack(fill='both', expand=True)
 
     def populate_combobox(self):
-        # Populate with item names
-        names = sorted(list(self.item_map.keys()))
-        self.analytics_combo['values'] = names
-        if names:
+        # Populate with the pre-sorted item names
+        self.analytics_combo['values'] = self._sorted_names
+        if self._sorted_names:
             self.analytics_combo.current(0)
 
     def plot_item_history(self):
-        if not MATPLOTLIB_AVAILABLE:
+        if not _import_matplotlib():
             return
 
         item_name = self.analytics_combo.get()
@@ -710,40 +924,79 @@ class SupermarketApp:
         
         item_id = self.item_map[item_name]
         
-        # Fetch history
-        conn = get_conn()
-        c = conn.cursor()
-        c.execute("SELECT record_date, quantity FROM stock_history WHERE item_id=? ORDER BY record_date", (item_id,))
-        rows = c.fetchall()
-        conn.close()
+        # repeat clicks for the same, unchanged product are a no-op
+        if item_id == self._last_plotted_item_id and item_id not in self._hist_dirty:
+            return
+
+        # reuse the parsed arrays unless a checkout touched this item since
+        if item_id in self._hist_dirty:
+            self._hist_cache.pop(item_id, None)
+            self._hist_dirty.discard(item_id)
+        cached = self._hist_cache.get(item_id)
+        if cached is not None:
+            self._last_plotted_item_id = item_id
+            self._apply_plot(item_name, *cached)
+            return
 
+        # fetch+parse off the Tk thread so long histories don't freeze the UI;
+        # the result is marshalled back to the main thread via root.after
+        future = self.db_pool.submit(self._load_history, item_id)
+        future.add_done_callback(
+            lambda fut: self.root.after(0, self._on_history_ready, item_name, item_id, fut))
+
+    def _load_history(self, item_id):
+        # worker thread: one connection per thread, tuple rows (no sqlite3.Row
+        # wrapping), datetime64 parsing in C instead of per-row strptime
+        conn = getattr(self._db_local, 'conn', None)
+        if conn is None:
+            conn = self._db_local.conn = get_conn()
+        c = tuple_cursor(conn)
+        c.execute(HIST_SQL, (item_id,))
+        rows = c.fetchall()
         if not rows:
+            return None
+        raw_ts, raw_quants = zip(*rows)
+        # integer seconds -> datetime64 is a cast, no string parsing at all.
+        # record_ts holds true epochs but naive datetime64 renders as UTC, so
+        # shift by the current UTC offset to plot local wall time like the
+        # record_date strings always did.
+        ts = np.fromiter(raw_ts, dtype=np.int64, count=len(rows))
+        dates = (ts + time.localtime().tm_gmtoff).astype('datetime64[s]')
+        quants = np.fromiter(raw_quants, dtype=np.int64, count=len(rows))
+        return dates, quants
+
+    def _on_history_ready(self, item_name, item_id, future):
+        result = future.result()
+        if result is None:
             messagebox.showinfo("No Data", f"No history found for {item_name}")
             return
-
-        dates = [datetime.strptime(r['record_date'], "%Y-%m-%d %H:%M:%S") for r in rows]
-        quants = [r['quantity'] for r in rows]
-
-        # Clear previous graph
-        for widget in self.graph_container.winfo_children():
-            widget.destroy()
-
-        # Plot
-        fig = Figure(figsize=(8, 5), dpi=100)
-        ax = fig.add_subplot(111)
-        ax.plot(dates, quants, marker='o', linestyle='-', color='blue')
-        ax.set_title(f"Stock History: {item_name}")
-        ax.set_xlabel("Time")
-        ax.set_ylabel("Quantity")
-        ax.grid(True)
-        
-        # Format date on X axis
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
-        fig.autofmt_xdate()
-
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_container)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+        self._hist_cache[item_id] = result
+        self._last_plotted_item_id = item_id
+        self._apply_plot(item_name, *result)
+
+    def _apply_plot(self, item_name, dates, quants):
+        # convert to matplotlib float days once; the axis is already in date
+        # mode, so no per-point unit conversion happens at draw time
+        xfloat = mdates.date2num(dates)
+
+        # downsample very long histories: an axes can only show ~its pixel
+        # width of distinct x positions, so keep ~2x that many points
+        px_width = int(self.hist_ax.bbox.width) or 800
+        if quants.size > 4 * px_width:
+            keep = _lttb_downsample(xfloat, quants.astype(np.float64), 2 * px_width)
+            xfloat = xfloat[keep]
+            quants = quants[keep]
+
+        # Update the persistent line and rescale; no artist teardown
+        self.hist_line.set_data(xfloat, quants)
+        if quants.size < 500:
+            self.hist_scatter.set_offsets(np.column_stack([xfloat, quants]))
+        else:
+            self.hist_scatter.set_offsets(np.empty((0, 2)))
+        self.hist_ax.set_title(f"Stock History: {item_name}")
+        self.hist_ax.relim()
+        self.hist_ax.autoscale_view()
+        self.hist_canvas.draw_idle()
 
 # ---------- Run ----------
 def main():